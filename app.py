@@ -1,24 +1,81 @@
 # Save this file as 'app.py'
-# Required: pip install Flask flask-cors requests
+# Required: pip install Flask flask-cors flask-caching flask-compress numpy orjson requests
 
-from flask import Flask, jsonify, render_template  # Added render_template
+from flask import Flask, Response, render_template  # Added render_template
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import random
+from flask_caching import Cache
+from flask_compress import Compress
+import numpy as np
+import orjson
 import time
 import os  # Added os to handle Render's port
 
 # 1. IMPORT THE NETWORK STATUS MODULE
-from network_status import get_network_strength 
+from network_status import get_network_strength
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Routes Flask's own JSON handling (jsonify, request.get_json) through orjson."""
+
+    def dumps(self, obj, **kwargs):
+        # Match the default provider: int/other dict keys become strings, sort_keys is honoured
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+def ojsonify(data):
+    """jsonify() replacement that hands orjson's bytes straight to the Response."""
+    return Response(orjson.dumps(data), mimetype='application/json')
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app) 
 
+# gzip/brotli JSON bodies for clients that send Accept-Encoding (slow mobile/LoRa uplinks)
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_MIN_SIZE'] = 64
+Compress(app)
+
 # --- CONFIGURATION ---
 TEMP_CRITICAL_THRESHOLD = 95.0
 GAS_CRITICAL_THRESHOLD = 120.0
 VIB_CRITICAL_THRESHOLD = 0.8
+NETWORK_CACHE_SECONDS = 5  # dashboards poll /network far more often than the ESP changes
 # --- END CONFIGURATION ---
 
+# Alert message templates, built once instead of per request.
+# Fields are positional: {0} temperature, {1} gas, {2} vibration.
+RED_ALERT_TEMPLATE = ("CRITICAL SYSTEM FAILURE: ALL Sensors Exceeded Thresholds! "
+                      "T:{0:.1f}°C, G:{1:.0f} ppm, V:{2:.2f}g.")
+YELLOW_ALERT_TEMPLATE = "WARNING: Elevated Sensor Readings: {}. Monitor system."
+TEMP_WARNING_TEMPLATE = "High Temp ({0:.1f}°C)"
+GAS_WARNING_TEMPLATE = "High Gas ({1:.0f} ppm)"
+VIB_WARNING_TEMPLATE = "High Vib ({2:.2f} g)"
+
+def _build_alert_table():
+    """(severity, template) per threshold bitmask: bit 2 = temp, bit 1 = gas, bit 0 = vib."""
+    table = [None] * 8  # mask 0: nothing exceeded
+    for mask in range(1, 7):
+        parts = [tpl for bit, tpl in ((4, TEMP_WARNING_TEMPLATE),
+                                      (2, GAS_WARNING_TEMPLATE),
+                                      (1, VIB_WARNING_TEMPLATE)) if mask & bit]
+        table[mask] = ('yellow', YELLOW_ALERT_TEMPLATE.format(', '.join(parts)))
+    table[7] = ('red', RED_ALERT_TEMPLATE)
+    return tuple(table)
+
+ALERT_TABLE = _build_alert_table()
+
+# In-process cache; set CACHE_TYPE=RedisCache (+ CACHE_REDIS_URL) to share it between gunicorn workers.
+cache = Cache(app, config={
+    'CACHE_TYPE': os.environ.get('CACHE_TYPE', 'SimpleCache'),
+    'CACHE_REDIS_URL': os.environ.get('CACHE_REDIS_URL'),
+    'CACHE_DEFAULT_TIMEOUT': NETWORK_CACHE_SECONDS,
+})
+
 # --- NEW ROUTES FOR YOUR DASHBOARDS ---
 
 @app.route('/')
@@ -45,21 +102,35 @@ def other_pages(page_name):
 
 # --- END NEW ROUTES ---
 
+# Simulated readings are generated in NumPy batches and handed out as plain Python floats
+_SIM_BATCH = 4096
+_rng = np.random.default_rng()
+_readings = []
+
+# Per-sensor (temperature, gas_ppm, vibration_g) ranges for the two simulated regimes
+NORMAL_LO = np.array([85.0, 80.0, 0.6])
+NORMAL_HI = np.array([105.0, 150.0, 1.2])
+CRITICAL_LO = np.array([98.0, 130.0, 0.9])
+CRITICAL_HI = np.array([110.0, 200.0, 1.5])
+
+def _refill_readings():
+    """Append _SIM_BATCH readings: regime pick + bounds applied to the whole batch at once."""
+    u = _rng.random((_SIM_BATCH, 4))
+    critical = u[:, :1] < 0.05
+    lo = np.where(critical, CRITICAL_LO, NORMAL_LO)
+    hi = np.where(critical, CRITICAL_HI, NORMAL_HI)
+    _readings.extend((lo + (hi - lo) * u[:, 1:]).tolist())
+
 def fetch_external_sensor_data():
     """*** SIMULATION MODE ***"""
-    if random.random() < 0.05:
-        data = {
-            'temperature': random.uniform(98, 110),
-            'gas_ppm': random.uniform(130, 200),
-            'vibration_g': random.uniform(0.9, 1.5)
-        }
-    else:
-        data = {
-            'temperature': random.uniform(85, 105), 
-            'gas_ppm': random.uniform(80, 150), 
-            'vibration_g': random.uniform(0.6, 1.2) 
-        }
-    return data
+    while True:
+        try:
+            # list.pop is atomic under the GIL, so no lock; racing refills just over-generate
+            temperature, gas_ppm, vibration_g = _readings.pop()
+            break
+        except IndexError:
+            _refill_readings()
+    return {'temperature': temperature, 'gas_ppm': gas_ppm, 'vibration_g': vibration_g}
 
 @app.route('/alerts', methods=['GET'])
 def get_alert_status():
@@ -68,31 +139,31 @@ def get_alert_status():
     current_gas = data.get('gas_ppm', 0)
     current_vib = data.get('vibration_g', 0)
 
-    temp_is_high = current_temp > TEMP_CRITICAL_THRESHOLD
-    gas_is_high = current_gas > GAS_CRITICAL_THRESHOLD
-    vib_is_high = current_vib > VIB_CRITICAL_THRESHOLD
-    
-    if temp_is_high and gas_is_high and vib_is_high:
-        message = (f"CRITICAL SYSTEM FAILURE: ALL Sensors Exceeded Thresholds! "
-                   f"T:{current_temp:.1f}°C, G:{current_gas:.0f} ppm, V:{current_vib:.2f}g.")
-        return jsonify({'severity': 'red', 'message': message, 'timestamp': time.time()})
-    
-    elif temp_is_high or gas_is_high or vib_is_high:
-        warnings = []
-        if temp_is_high: warnings.append(f"High Temp ({current_temp:.1f}°C)")
-        if gas_is_high: warnings.append(f"High Gas ({current_gas:.0f} ppm)")
-        if vib_is_high: warnings.append(f"High Vib ({current_vib:.2f} g)")
-        message = f"WARNING: Elevated Sensor Readings: {', '.join(warnings)}. Monitor system."
-        return jsonify({'severity': 'yellow', 'message': message, 'timestamp': time.time()})
-    else:
+    mask = ((current_temp > TEMP_CRITICAL_THRESHOLD) << 2
+            | (current_gas > GAS_CRITICAL_THRESHOLD) << 1
+            | (current_vib > VIB_CRITICAL_THRESHOLD))
+    entry = ALERT_TABLE[mask]
+    if entry is None:
+        # A fresh 204 each time: a shared Response object would be mutated by the CORS after_request hook
         return ('', 204)
 
+    severity, template = entry
+    message = template.format(current_temp, current_gas, current_vib)
+    return ojsonify({'severity': severity, 'message': message, 'timestamp': time.time()})
+
 @app.route('/network', methods=['GET'])
+@cache.cached(timeout=NETWORK_CACHE_SECONDS)
 def get_network_data():
+    # Shared keep-alive session in network_status + the response cache above keep this cheap
     data = get_network_strength()
-    return jsonify(data)
+    return ojsonify(data)
+
+# hypercorn can serve this WSGI app directly and runs each request on its thread pool:
+#   hypercorn app:app --worker-class uvloop --bind 0.0.0.0:$PORT
+# (Don't wrap it in asgiref's WsgiToAsgi: that funnels every request through one shared thread.)
 
 if __name__ == '__main__':
     # Modified for Render: Use os.environ.get for the PORT
+    # Local runs only; production goes through gunicorn (see gunicorn.conf.py)
     port = int(os.environ.get("PORT", 5000))
-    app.run(debug=True, host='0.0.0.0', port=port)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port)
\ No newline at end of file
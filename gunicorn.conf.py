@@ -0,0 +1,11 @@
+# gunicorn.conf.py
+# Picked up automatically by: gunicorn app:app
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Threaded workers: dashboards poll /alerts and /network concurrently
+workers = int(os.environ.get("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+worker_class = "gthread"
+threads = 8
+keepalive = 30
@@ -1,8 +1,13 @@
 # modules/network_status.py
 import requests, random, time
+from requests.adapters import HTTPAdapter
 
 ESP_NET_URL = "http://192.168.1.61/network" # change to your ESP2
 
+# One keep-alive session so repeated polls reuse the TCP connection to the ESP
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
 def _mock():
     # ... (function body remains the same)
     rssi = random.randint(-86, -54)           # dBm
@@ -16,7 +21,7 @@ def get_network_strength():
     Expected JSON: {"rssi": -65, "quality": 78}
     """
     try:
-        r = requests.get(ESP_NET_URL, timeout=2)
+        r = _session.get(ESP_NET_URL, timeout=2)
         if r.status_code == 200:
             data = r.json()
             data.setdefault("timestamp", int(time.time()))
@@ -1,35 +1,117 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Deque, Iterable, List, Tuple, Optional
+from dataclasses import dataclass, field
+from typing import Deque, Iterable, Tuple, Optional
 from collections import deque
 import math
 import time
 import random # Needed for Kalman1D Demo
 
+import numpy as np
+
+# ====================================================================
+# BATCH KERNELS
+# ====================================================================
+# Calling an njit function per sample costs more than the arithmetic it
+# saves, so the single-sample update() methods stay in plain Python and
+# only the update_batch() paths use these. numba and scipy are imported on
+# first use so importing this module stays cheap for the plain classes.
+
+# Relative gain change below which the Kalman filter is treated as steady-state
+_KALMAN_GAIN_RTOL = 1e-12
+
+
+def _ema_filter(alpha, level, values):
+    """
+    EMA over `values` starting from `level`, as a first-order IIR filter:
+    L_n = alpha * z_n + (1 - alpha) * L_{n-1}. Returns (outputs, last level).
+    """
+    from scipy.signal import lfilter
+
+    out, _ = lfilter([alpha], [1.0, -(1.0 - alpha)], values, zi=[(1.0 - alpha) * level])
+    return out, out[-1]
+
+
+_jitted = {}
+
+
+def _jit(fn):
+    """Numba-compile `fn` on first call (cached on disk across runs)."""
+    compiled = _jitted.get(fn)
+    if compiled is None:
+        from numba import njit
+
+        compiled = _jitted[fn] = njit(cache=True)(fn)
+    return compiled
+
+
+def _kalman_batch(x, p, q, r, zs, rtol):
+    """
+    Exact Kalman recursion until the gain stops changing.
+    Returns (outputs, x, p, gain, samples consumed).
+    """
+    out = np.empty_like(zs)
+    k = k_prev = -1.0
+    for i in range(zs.size):
+        p = p + q
+        k = p / (p + r)
+        x = x + k * (zs[i] - x)
+        p = (1 - k) * p
+        out[i] = x
+        if abs(k - k_prev) <= rtol * k:
+            return out[:i + 1], x, p, k, i + 1
+        k_prev = k
+    return out, x, p, k, zs.size
+
 # ====================================================================
 # CLASS DEFINITIONS
 # ====================================================================
 
 # ---------- 1) Exponential Moving Average Forecaster ----------
 
-@dataclass
 class EMAForecaster:
     """
     Fast, online exponential moving average forecaster.
 
     alpha: 0..1 smoothing factor (higher = reacts faster to new data)
     """
-    alpha: float = 0.3
-    _level: Optional[float] = None
+    # Plain slotted class rather than a dataclass: update() is the per-sample hot path
+    __slots__ = ("alpha", "_level")
+
+    def __init__(self, alpha: float = 0.3, _level: Optional[float] = None):
+        self.alpha = alpha
+        self._level = _level
+
+    def __repr__(self) -> str:
+        return f"EMAForecaster(alpha={self.alpha!r}, _level={self._level!r})"
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.alpha, self._level) == (other.alpha, other._level)
+
+    __hash__ = None  # mutable and compared by value, like the dataclass it replaced
 
     def update(self, value: float) -> float:
         """Feed a new observation and get the updated EMA."""
-        if self._level is None:
-            self._level = value
+        level = self._level
+        if level is None:
+            level = value
         else:
             # EMA formula: L_t = alpha * Y_t + (1 - alpha) * L_{t-1}
-            self._level = self.alpha * value + (1 - self.alpha) * self._level
-        return self._level
+            alpha = self.alpha
+            level = alpha * value + (1 - alpha) * level
+        self._level = level
+        return level
+
+    def update_batch(self, values) -> np.ndarray:
+        """Feed an array of observations; returns the EMA after each one."""
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return values
+        level = values[0] if self._level is None else self._level
+        out, level = _ema_filter(self.alpha, level, values)
+        self._level = float(level)
+        return out
 
     def predict(self, steps: int = 1) -> float:
         """
@@ -40,6 +122,22 @@ class EMAForecaster:
         return self._level
 
 
+def make_ema(alpha: float = 0.3):
+    """
+    Closure version of EMAForecaster.update() for tight loops:
+        update = make_ema(0.2); smoothed = update(x)
+    alpha and the running level live in the closure, so there are no attribute lookups.
+    """
+    level = None
+
+    def update(value: float) -> float:
+        nonlocal level
+        level = value if level is None else alpha * value + (1 - alpha) * level
+        return level
+
+    return update
+
+
 # ---------- 2) Simple (1D) Kalman Filter for Sensor Smoothing ----------
 
 @dataclass
@@ -71,6 +169,28 @@ class Kalman1D:
         self.p = (1 - k) * self.p
         return self.x
 
+    def update_batch(self, zs) -> np.ndarray:
+        """Update with an array of measurements; returns the filtered estimate after each one."""
+        zs = np.asarray(zs, dtype=np.float64)
+        if zs.size == 0:
+            return zs
+        head = zs[:0]
+        if self.x is None:
+            # first observation initializes the filter, same as update()
+            self.x = float(zs[0])
+            self.p = 1.0
+            head, zs = zs[:1], zs[1:]
+
+        # Step exactly while the gain is still moving (p does not depend on z)...
+        out, x, p, k, n = _jit(_kalman_batch)(self.x, self.p, self.q, self.r, zs, _KALMAN_GAIN_RTOL)
+        # ...after which the filter is just an EMA with alpha = steady-state gain
+        if n < zs.size:
+            tail, x = _ema_filter(k, x, zs[n:])
+            out = np.concatenate((out, tail))
+
+        self.x, self.p = float(x), float(p)
+        return np.concatenate((head, out))
+
 
 # ---------- 3) ETA (Arrival Time) Prediction ----------
 
@@ -81,30 +201,53 @@ class ETAPredictor:
     """
     window: int = 30  # number of recent speed samples
     _speeds: Deque[float] = None
+    # Running harmonic-mean terms over the positive speeds in _speeds (derived state)
+    _inv_sum: float = field(default=0.0, init=False, compare=False, repr=False)
+    _valid_count: int = field(default=0, init=False, compare=False, repr=False)
 
     def __post_init__(self):
         self._speeds = deque(maxlen=self.window)
 
     def update_speed(self, speed_mps: float) -> None:
         """Add a speed sample in meters/second."""
-        self._speeds.append(max(0.0, float(speed_mps)))
+        if self.window < 1:
+            return  # no history kept; ETA falls back to min_speed
+        speed = max(0.0, float(speed_mps))
+        resync = False
+        if len(self._speeds) == self.window:
+            # deque is about to evict its oldest sample; drop it from the running sums
+            old = self._speeds[0]
+            if old > 0:
+                inv_old = 1.0 / old
+                # Subtracting a term that dominates the sum cancels catastrophically
+                # (e.g. 1e20 + 0.2 - 1e20 == 0.0); rebuild from the samples instead.
+                resync = inv_old > 0.5 * self._inv_sum
+                self._inv_sum -= inv_old
+                self._valid_count -= 1
+        self._speeds.append(speed)
+        if resync:
+            self._resync()
+        elif speed > 0:
+            self._inv_sum += 1.0 / speed
+            self._valid_count += 1
+
+    def _resync(self):
+        """Recompute the running sums exactly from the samples in the window."""
+        inv = [1.0 / s for s in self._speeds if s > 0]
+        self._inv_sum = math.fsum(inv)
+        self._valid_count = len(inv)
 
     def estimate_eta_seconds(self, remaining_distance_m: float, min_speed: float = 0.05) -> float:
         """
         Returns ETA in seconds using the harmonic mean of recent speeds.
         """
-        if not self._speeds:
+        # Only speeds greater than zero count, to avoid division issues
+        if self._valid_count == 0:
             v = min_speed
         else:
-            # Use speeds greater than zero to avoid division issues
-            valid_speeds = [s for s in self._speeds if s > 0]
-            if not valid_speeds:
-                 v = min_speed
-            else:
-                # Harmonic mean: N / Sum(1/s)
-                inv = [1.0 / s for s in valid_speeds]
-                v = len(valid_speeds) / sum(inv)
-                v = max(v, min_speed) # Clamp to minimum speed
+            # Harmonic mean: N / Sum(1/s)
+            v = self._valid_count / self._inv_sum
+            v = max(v, min_speed) # Clamp to minimum speed
 
         return remaining_distance_m / v
 
@@ -115,44 +258,89 @@ class ETAPredictor:
 class RiskHeatmap:
     """
     Maintains a risk grid that decays over time and can be reinforced by new observations.
+    Decay is exponential: a cell keeps exp(-decay_per_sec * dt) of its value after dt seconds.
     """
     rows: int
     cols: int
-    decay_per_sec: float = 0.01  # 1% per second
-    _grid: List[List[float]] = None
+    decay_per_sec: float = 0.01  # ~1% per second
+    # flat row-major buffer, cell (r, c) lives at r * cols + c; compared via __eq__ below
+    _grid: np.ndarray = field(default=None, compare=False, repr=False)
     _last_ts: float = None
+    # Stored cells hold true_value / _scale, so decaying the whole grid is one scalar multiply.
+    _scale: float = field(default=1.0, init=False, compare=False, repr=False)
+    # get_json() cache, keyed by (reinforce count, 100 ms time bucket)
+    _version: int = field(default=0, init=False, compare=False, repr=False)
+    _cached_key: Optional[Tuple[int, int]] = field(default=None, init=False, compare=False, repr=False)
+    _cached_blob: Optional[bytes] = field(default=None, init=False, compare=False, repr=False)
+
+    # Fold _scale back into the grid once it drifts this far, to keep float32 cells in range
+    _SCALE_MIN = 1e-6
+    _SCALE_MAX = 1e6
 
     def __post_init__(self):
-        self._grid = [[0.0 for _ in range(self.cols)] for _ in range(self.rows)]
-        self._last_ts = time.time()
+        self._grid = np.zeros(self.rows * self.cols, dtype=np.float32)
+        self._last_ts = time.monotonic()
+
+    def __eq__(self, other):
+        # ndarrays can't go through the generated tuple comparison; compare the decayed grids
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return ((self.rows, self.cols, self.decay_per_sec) == (other.rows, other.cols, other.decay_per_sec)
+                and np.array_equal(self.get(), other.get()))
 
     def _apply_decay(self):
-        now = time.time()
+        now = time.monotonic()  # immune to NTP/DST wall-clock jumps
         dt = max(0.0, now - self._last_ts)
         self._last_ts = now
         if dt <= 0:
             return
         
-        # Calculate the decay factor for the elapsed time
-        decay_factor = max(0.0, 1.0 - self.decay_per_sec * dt)
-        
-        for r in range(self.rows):
-            for c in range(self.cols):
-                self._grid[r][c] *= decay_factor
+        # Exponential decay composes exactly across calls: exp(-k*a) * exp(-k*b) = exp(-k*(a+b))
+        self._scale *= math.exp(-self.decay_per_sec * dt)
+        if not (self._SCALE_MIN <= self._scale <= self._SCALE_MAX):
+            self._rebase()
+
+    def _rebase(self):
+        """Apply the pending scale to every cell and reset it to 1."""
+        self._grid *= np.float32(self._scale)
+        self._scale = 1.0
 
     def reinforce(self, cells: Iterable[Tuple[int, int]], amount: float = 1.0) -> None:
         """
         Increase risk at given (row, col) cells. Decay is applied first.
         """
         self._apply_decay()
-        for r, c in cells:
-            if 0 <= r < self.rows and 0 <= c < self.cols:
-                self._grid[r][c] += amount
-
-    def get(self) -> List[List[float]]:
-        """Return the current (decayed) risk grid. Decay is applied first."""
+        idx = np.asarray(list(cells)).reshape(-1, 2)
+        if idx.size and not np.issubdtype(idx.dtype, np.integer):
+            # a plain intp cast would silently truncate (1.5, 0) to (1, 0)
+            raise TypeError("cell indices must be integers")
+        idx = idx.astype(np.intp, copy=False)
+        rs, cs = idx[:, 0], idx[:, 1]
+        mask = (rs >= 0) & (rs < self.rows) & (cs >= 0) & (cs < self.cols)
+        # add.at (not +=) so repeated cells are reinforced once per occurrence
+        np.add.at(self._grid, rs[mask] * self.cols + cs[mask], amount / self._scale)
+        self._version += 1
+
+    def get(self) -> np.ndarray:
+        """
+        Return the current (decayed) risk grid as a (rows, cols) float32 array.
+        Decay is applied first. Use .tolist() at the JSON boundary.
+        """
         self._apply_decay()
-        return self._grid
+        return (self._grid * np.float32(self._scale)).reshape(self.rows, self.cols)
+
+    def get_json(self) -> bytes:
+        """
+        Return the current grid as JSON bytes (list of rows).
+        Calls within the same 100 ms with no reinforce() in between reuse the last encoding.
+        """
+        key = (self._version, int(time.monotonic() * 10))
+        if key != self._cached_key:
+            import orjson
+
+            self._cached_blob = orjson.dumps(self.get(), option=orjson.OPT_SERIALIZE_NUMPY)
+            self._cached_key = key
+        return self._cached_blob
 
 # ====================================================================
 # DEMONSTRATION SCRIPT